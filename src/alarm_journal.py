@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from event import CalendarEvent
+from logger import logger
+
+"""
+Append-only journal of alarms that have already been shown:
+1. Every claimed, fired (shown) or dismissed alarm is appended as one JSON line
+2. On startup the journal is replayed into an in-memory index
+3. Alarms claimed but never shown, because the process died, are forgotten on
+   startup so they can be shown again
+4. Entries for events long in the past are dropped when the file is compacted
+"""
+
+JOURNAL_PATH = "alarm_journal.jsonl"
+
+CLAIMED = "claimed"
+FIRED = "fired"
+DISMISSED = "dismissed"
+
+
+def normalize_start(start: str) -> str:
+    """The same instant written with different offsets maps to the same UTC string."""
+    return datetime.fromisoformat(start).astimezone(timezone.utc).isoformat()
+
+
+def alarm_key(event: CalendarEvent) -> tuple[str, str]:
+    """Identifies an alarm by event id and start time, so a rescheduled event alarms again."""
+    return event["id"], normalize_start(event["start"]["dateTime"])
+
+
+class AlarmJournal:
+    def __init__(
+        self,
+        path: str = JOURNAL_PATH,
+        retention: int = 24 * 60 * 60,
+        compact_every: int = 100,
+    ):
+        self.path = path
+        self.retention = retention  # in seconds after event start
+        self.compact_every = compact_every  # appends between compactions
+        self._entries: dict[tuple[str, str], dict] = {}
+        self._appends_since_compact = 0
+        self._lock = threading.Lock()
+        self._load()
+        self.compact()
+
+    def has_fired(self, event: CalendarEvent) -> bool:
+        """True once the alarm is claimed, so it is never shown twice in one run."""
+        return alarm_key(event) in self._entries
+
+    def was_dismissed(self, event: CalendarEvent) -> bool:
+        entry = self._entries.get(alarm_key(event))
+        return entry is not None and entry["state"] == DISMISSED
+
+    def record_fired(self, event: CalendarEvent):
+        self._append(event, FIRED)
+
+    def record_dismissed(self, event: CalendarEvent):
+        self._append(event, DISMISSED)
+
+    def claim(self, event: CalendarEvent) -> bool:
+        """Records the alarm as about to be shown, returns False if it already was."""
+        with self._lock:
+            if alarm_key(event) in self._entries:
+                return False
+            self._write(event, CLAIMED)
+        self._compact_if_due()
+        return True
+
+    def _append(self, event: CalendarEvent, state: str):
+        with self._lock:
+            self._write(event, state)
+        self._compact_if_due()
+
+    def _write(self, event: CalendarEvent, state: str):
+        """Adds the entry to the index and the file, the caller holds the lock."""
+        event_id, start = alarm_key(event)
+        entry = {
+            "id": event_id,
+            "start": start,
+            "state": state,
+            "at": datetime.now(timezone.utc).isoformat(),
+        }
+        self._entries[(event_id, start)] = entry
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            logger.error(f"Failed to write alarm journal {self.path}: {e}")
+        self._appends_since_compact += 1
+
+    def _compact_if_due(self):
+        if self._appends_since_compact >= self.compact_every:
+            self.compact()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    entry["start"] = normalize_start(entry["start"])
+                    key = (entry["id"], entry["start"])
+                except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+                    # a crash mid-write can leave a torn last line
+                    logger.warning(
+                        f"Skipping bad alarm journal line {line_number} in {self.path}: {e}"
+                    )
+                    continue
+                self._entries[key] = entry
+        interrupted = [
+            key for key, entry in self._entries.items() if entry["state"] == CLAIMED
+        ]
+        for key in interrupted:
+            del self._entries[key]
+        logger.info(
+            f"Loaded {len(self._entries)} alarms from {self.path}, "
+            f"{len(interrupted)} interrupted alarms will be shown again"
+        )
+
+    def _is_expired(self, entry: dict, now: datetime) -> bool:
+        try:
+            start_dt = datetime.fromisoformat(entry["start"])
+        except ValueError:
+            return True
+        return start_dt < now - timedelta(seconds=self.retention)
+
+    def compact(self):
+        """Rewrites the journal with one line per live alarm, dropping expired ones."""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._entries = {
+                key: entry
+                for key, entry in self._entries.items()
+                if not self._is_expired(entry, now)
+            }
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    for entry in self._entries.values():
+                        f.write(json.dumps(entry) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.error(f"Failed to compact alarm journal {self.path}: {e}")
+            self._appends_since_compact = 0
+
+
+def main():
+    journal = AlarmJournal()
+    for entry in journal._entries.values():
+        print(entry)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import random
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from event import CalendarEvent
+
+"""
+Sorted time index over cached calendar events:
+1. Events are kept in a list sorted by start time, so lookups are a bisect
+2. Sync deltas insert, replace or delete single events instead of rebuilding
+3. Overlap queries scan back by the longest indexed event's duration
+All-day events have no dateTime and are not indexed, same as filter_events.
+Run this file for a microbenchmark.
+"""
+
+
+def event_bounds(event: CalendarEvent) -> tuple[float, float] | None:
+    """Returns (start, end) as timestamps, or None for all-day events."""
+    start_str = event["start"].get("dateTime")
+    if not start_str:
+        return None
+    start = datetime.fromisoformat(start_str).timestamp()
+    end_str = event.get("end", {}).get("dateTime")
+    end = datetime.fromisoformat(end_str).timestamp() if end_str else start
+    return start, max(start, end)
+
+
+class EventIndex:
+    def __init__(self):
+        self._starts: list[tuple[float, str]] = []  # (start, id), sorted
+        self._events: dict[str, CalendarEvent] = {}
+        self._bounds: dict[str, tuple[float, float]] = {}
+        # longest indexed duration, how far back overlap queries scan
+        self._max_duration = 0.0
+        self._durations: Counter[float] = Counter()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._events)
+
+    def __contains__(self, event_id):
+        return event_id in self._events
+
+    def get(self, event_id: str) -> CalendarEvent | None:
+        return self._events.get(event_id)
+
+    def upsert(self, event: CalendarEvent):
+        """Inserts the event, replacing any indexed event with the same id."""
+        with self._lock:
+            self._upsert(event)
+
+    def _upsert(self, event: CalendarEvent):
+        self._remove(event["id"])
+        bounds = event_bounds(event)
+        if bounds is None:
+            return
+        start, end = bounds
+        self._events[event["id"]] = event
+        self._bounds[event["id"]] = bounds
+        self._durations[end - start] += 1
+        self._max_duration = max(self._max_duration, end - start)
+        insort(self._starts, (start, event["id"]))
+
+    def remove(self, event_id: str):
+        with self._lock:
+            self._remove(event_id)
+
+    def _remove(self, event_id: str):
+        bounds = self._bounds.pop(event_id, None)
+        if bounds is None:
+            return
+        del self._events[event_id]
+        position = bisect_left(self._starts, (bounds[0], event_id))
+        del self._starts[position]
+        duration = bounds[1] - bounds[0]
+        self._durations[duration] -= 1
+        if not self._durations[duration]:
+            del self._durations[duration]
+            if duration == self._max_duration:
+                # the last of the longest events went, so overlap scans shrink again
+                self._max_duration = max(self._durations, default=0.0)
+
+    def apply_changes(self, events: list[CalendarEvent]):
+        """Applies a batch of changed events, cancelled ones are deleted."""
+        for event in events:
+            if event.get("status") == "cancelled":
+                self.remove(event["id"])
+            else:
+                self.upsert(event)
+
+    def sync(self, events: list[CalendarEvent]) -> tuple[int, int]:
+        """
+        Makes the index match events, touching only events that were added,
+        changed (by etag) or removed. Returns (upserted, removed) counts.
+        """
+        incoming = {event["id"]: event for event in events}
+        upserted = 0
+        with self._lock:
+            removed = [
+                event_id for event_id in self._events if event_id not in incoming
+            ]
+            for event_id in removed:
+                self._remove(event_id)
+            for event_id, event in incoming.items():
+                current = self._events.get(event_id)
+                if current is not None and current.get("etag") == event.get("etag"):
+                    continue
+                self._upsert(event)
+                upserted += 1
+        return upserted, len(removed)
+
+    def next_after(
+        self,
+        t: datetime,
+        skip: Callable[[CalendarEvent], bool] | None = None,
+    ) -> CalendarEvent | None:
+        """Returns the first event starting at or after t that skip doesn't reject."""
+        with self._lock:
+            start = bisect_left(self._starts, (t.timestamp(), ""))
+            for i in range(start, len(self._starts)):
+                event = self._events[self._starts[i][1]]
+                if skip is None or not skip(event):
+                    return event
+        return None
+
+    def overlapping(self, t1: datetime, t2: datetime) -> list[CalendarEvent]:
+        """Returns events overlapping [t1, t2), sorted by start time."""
+        start_ts, end_ts = t1.timestamp(), t2.timestamp()
+        with self._lock:
+            low = bisect_left(self._starts, (start_ts - self._max_duration, ""))
+            high = bisect_left(self._starts, (end_ts, ""))
+            return [
+                self._events[event_id]
+                for _, event_id in self._starts[low:high]
+                if self._bounds[event_id][1] > start_ts
+                # zero-length events overlap if they start inside the range
+                or self._bounds[event_id][0] >= start_ts
+            ]
+
+    def concurrent_with(self, event: CalendarEvent) -> list[CalendarEvent]:
+        """Returns other indexed events overlapping this one, sorted by start time."""
+        bounds = event_bounds(event)
+        if bounds is None:
+            return []
+        start, end = bounds
+        # treat zero-length events as one second long so they still overlap
+        end = max(end, start + 1)
+        return [
+            other
+            for other in self.overlapping(
+                datetime.fromtimestamp(start, timezone.utc),
+                datetime.fromtimestamp(end, timezone.utc),
+            )
+            if other["id"] != event["id"]
+        ]
+
+    def starting_within(self, t: datetime, seconds: float) -> list[CalendarEvent]:
+        """Returns events starting in [t, t + seconds), sorted by start time."""
+        start_ts = t.timestamp()
+        with self._lock:
+            low = bisect_left(self._starts, (start_ts, ""))
+            high = bisect_left(self._starts, (start_ts + seconds, ""))
+            return [self._events[event_id] for _, event_id in self._starts[low:high]]
+
+
+def make_random_events(count: int, calendars: int, days: int) -> list[CalendarEvent]:
+    now = datetime.now(timezone.utc)
+    events = []
+    for i in range(count):
+        start = now + timedelta(minutes=random.randrange(days * 24 * 60))
+        end = start + timedelta(minutes=random.choice([15, 30, 45, 60, 90, 120]))
+        events.append(
+            {
+                "id": f"cal{i % calendars}-event{i}",
+                "etag": "1",
+                "summary": f"Event {i}",
+                "start": {"dateTime": start.isoformat()},
+                "end": {"dateTime": end.isoformat()},
+            }
+        )
+    return events
+
+
+def main():
+    count, calendars, days, queries = 50_000, 200, 90, 10_000
+    events = make_random_events(count, calendars, days)
+    index = EventIndex()
+    now = datetime.now(timezone.utc)
+    query_times = [
+        now + timedelta(minutes=random.randrange(days * 24 * 60))
+        for _ in range(queries)
+    ]
+
+    def report(name, seconds, ops):
+        print(f"{name:<28} {seconds * 1e6 / ops:8.2f} us/op  ({ops} ops)")
+
+    print(f"{count} events across {calendars} calendars over {days} days")
+
+    t = time.perf_counter()
+    index.sync(events)
+    report("initial sync", time.perf_counter() - t, count)
+
+    t = time.perf_counter()
+    for q in query_times:
+        index.next_after(q)
+    report("next_after", time.perf_counter() - t, queries)
+
+    t = time.perf_counter()
+    for q in query_times:
+        index.overlapping(q, q + timedelta(minutes=30))
+    report("overlapping 30 min", time.perf_counter() - t, queries)
+
+    t = time.perf_counter()
+    for q in query_times:
+        index.starting_within(q, 3 * 60 + 5)
+    report("starting_within 185 s", time.perf_counter() - t, queries)
+
+    # a typical poll: a handful of edits, additions and cancellations
+    delta = 100
+    changed = [{**event, "etag": "2"} for event in events[:delta]]
+    added = make_random_events(delta, calendars, days)
+    for i, event in enumerate(added):
+        event["id"] = f"new-event{i}"
+    updated = changed + events[2 * delta :] + added
+    t = time.perf_counter()
+    upserted, removed = index.sync(updated)
+    report(f"delta sync ({upserted}+/{removed}-)", time.perf_counter() - t, 1)
+
+    cancelled = [{**event, "status": "cancelled"} for event in added]
+    t = time.perf_counter()
+    index.apply_changes(cancelled + changed)
+    report("apply_changes", time.perf_counter() - t, 2 * delta)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,84 +1,353 @@
 import datetime
-import time
+import threading
 from typing import Callable
 
 import requests
 
+from alarm_journal import AlarmJournal
 from event import CalendarEvent
+from event_index import EventIndex
+from ipc import IPC_PORT, IpcServer
 from logger import logger
+from request_governor import GovernorError
+from watchdog import Watchdog
 
 """
 Super Simple Event notifier:
 1. Check calendar for next event
 2. If event is soon, wait until it is time to send a notification, then send it
 3. If event is not soon, wait a bit, then go back to step 1
+Alarms already shown are kept in a journal so restarts don't repeat or lose them.
+The loop runs in a worker thread watched by a watchdog that reports stalled stages.
+Upcoming alarms and poll status can be queried over a local socket, see ipc.py.
+Fetched events are kept in an EventIndex, the next event is the first one not yet alarmed.
+Overlapping events that start within alarm_offset are listed on the same alert
+and don't get an alert of their own.
 """
 
 
+# how far ahead the IPC "upcoming" command looks, in seconds
+UPCOMING_WINDOW = 24 * 60 * 60
+
+# seconds each stage may take before the watchdog reports it, waits add their own length
+STAGE_BUDGETS = {
+    "heartbeat": 30,
+    "fetch": 3 * 60,
+    "wait": 60,
+    "notify": 5 * 60,
+}
+
+
 class EventNotifier:
     def __init__(
         self,
-        get_next_event_func: Callable[[], CalendarEvent],
-        send_notification_func: Callable[[CalendarEvent], None],
+        get_events_func: Callable[[], list[CalendarEvent]],
+        send_notification_func: Callable[[CalendarEvent, EventIndex], bool | None],
         heartbeat_url: str,
         poll_interval: int = 15 * 60,
         alarm_offset: int = 3 * 60 + 5,
+        catch_up_grace: int = 5 * 60,
         heartbeat_period: int = 5 * 60,
+        journal: AlarmJournal | None = None,
+        stage_budgets: dict[str, float] | None = None,
+        restart_on_stall: bool = False,
+        ipc_port: int | None = IPC_PORT,
     ):
-        self.get_next_event_func = get_next_event_func
+        self.get_events_func = get_events_func
         self.send_notification_func = send_notification_func
         self.poll_interval = poll_interval  # in seconds
         self.alarm_offset = alarm_offset  # in seconds
+        # how long after an event starts a missed alarm is still shown, in seconds
+        self.catch_up_grace = catch_up_grace
         self.heartbeat_url = heartbeat_url
         self.heartbeat_period = heartbeat_period
+        self.journal = journal or AlarmJournal()
+        self.event_index = EventIndex()
+        self.stage_budgets = {**STAGE_BUDGETS, **(stage_budgets or {})}
+        self.restart_on_stall = restart_on_stall
+        self.watchdog = Watchdog(on_stall=self.on_stall)
+        self.worker: threading.Thread | None = None
+        # the last worker replaced after a stall, no new replacement while it's alive
+        self.replaced_worker: threading.Thread | None = None
+        self._stop_event = threading.Event()
+        self.ipc_port = ipc_port
+        self.ipc_server: IpcServer | None = None
+        self._test_alert_lock = threading.Lock()  # one test alert at a time
+        # in-memory state served over IPC
+        self.next_event: CalendarEvent | None = None
+        self.last_success: datetime.datetime | None = None
+        self.last_poll: dict = self.make_poll_status(None, ok=None)
 
     def start(self):
         logger.info("Starting notifier.")
-        while True:
-            self.check_and_wait()
+        self.watchdog.start()
+        self.start_ipc_server()
+        self.start_worker()
+
+    def stop(self):
+        logger.info("Stopping notifier.")
+        self._stop_event.set()
+        self.watchdog.stop()
+        if self.ipc_server:
+            self.ipc_server.stop()
+            self.ipc_server = None
+
+    def start_ipc_server(self):
+        if self.ipc_port is None:
+            return
+        handlers = {
+            "upcoming": self.get_upcoming_alarms,
+            "status": self.get_poll_status,
+            "test": self.fire_test_alert,
+        }
+        try:
+            self.ipc_server = IpcServer(handlers, port=self.ipc_port)
+        except OSError as e:
+            logger.error(f"Failed to start IPC server on port {self.ipc_port}: {e}")
+            return
+        self.ipc_server.start()
+
+    def is_running(self) -> bool:
+        return not self._stop_event.is_set()
+
+    def is_current_worker(self) -> bool:
+        """False in a worker that was replaced after a stall, which should bail out."""
+        return self.worker is threading.current_thread()
+
+    def start_worker(self):
+        self.worker = threading.Thread(target=self.run, name="notifier", daemon=True)
+        self.worker.start()
+
+    def run(self):
+        worker = threading.current_thread()
+        self.watchdog.watch(worker)
+        # a worker replaced after a stall exits once it gets unstuck
+        while self.is_running() and self.worker is worker:
+            try:
+                self.check_and_wait()
+            except Exception as e:
+                if not self.is_current_worker():
+                    # a replaced worker must not stop the one that took over
+                    logger.warning(f"Replaced notifier worker exited with: {e}")
+                    return
+                logger.exception(f"Notifier loop crashed: {e}")
+                self.send_heartbeat_fail(f"Notifier loop crashed: {e}")
+                self.stop()
+
+    def on_stall(self, stage, elapsed):
+        self.send_heartbeat_fail(f"Stage '{stage}' stalled for {elapsed:.0f} s")
+        if not self.restart_on_stall or not self.is_running():
+            return
+        if self.replaced_worker is not None and self.replaced_worker.is_alive():
+            # restarting again would just pile up stuck threads
+            logger.warning(
+                f"Not restarting notifier worker stuck in stage '{stage}', "
+                f"the worker replaced before it is still stuck."
+            )
+            return
+        logger.warning(f"Restarting notifier worker stuck in stage '{stage}'.")
+        self.replaced_worker = self.worker
+        self.start_worker()
+
+    def stage(self, name, extra=0):
+        return self.watchdog.stage(name, self.stage_budgets[name] + extra)
+
+    def wait(self, seconds):
+        """Sleeps for seconds, returning early if the notifier is stopped."""
+        with self.stage("wait", extra=seconds):
+            self._stop_event.wait(seconds)
 
     def check_and_wait(self):
-        self.send_heartbeat()
+        with self.stage("heartbeat"):
+            self.send_heartbeat()
+        if not self.is_current_worker():
+            return
 
         logger.info("Checking for next event.")
-        next_event = self.get_next_event_func()
+        with self.stage("fetch"):
+            next_event = self.poll()
+        if not self.is_current_worker():
+            return
+        if next_event is None:
+            logger.info(
+                f"No upcoming events. Waiting {self.poll_interval} s before checking again."
+            )
+            self.wait(self.poll_interval)
+            return
+
         time_till_notify = self.get_time_till_notify(next_event)
 
-        if time_till_notify < self.poll_interval:
+        if time_till_notify <= 0:
+            # alarm time passed while we were down or polling, possibly after start
+            logger.info("Missed alarm for event. Sending notification now.")
+            self.send_notification(next_event)
+        elif time_till_notify < self.poll_interval:
             logger.info(
                 f"Event Soon. Waiting {time_till_notify} s before sending notification."
             )
-            time.sleep(time_till_notify)
-            self.send_notification(next_event)
+            self.wait(time_till_notify)
+            if self.is_running() and self.is_current_worker():
+                self.send_notification(next_event)
         else:
             logger.info(
                 f"Event not soon. Waiting {self.poll_interval} s before checking again."
             )
-            time.sleep(self.poll_interval)
+            self.wait(self.poll_interval)
 
-    def get_time_till_notify(self, next_event):
+    def poll(self):
+        started = datetime.datetime.now(datetime.timezone.utc)
+        try:
+            events = self.get_events_func()
+        except GovernorError as e:
+            # the index still holds the last known schedule, keep alarming from it
+            logger.warning(f"Using last known schedule, Calendar API unavailable: {e}")
+            events = None
+            error = str(e)
+        except Exception as e:
+            if self.is_current_worker():
+                self.last_poll = self.make_poll_status(started, ok=False, error=str(e))
+            raise
+        if not self.is_current_worker():
+            return None
+        if events is None:
+            self.last_poll = self.make_poll_status(started, ok=False, error=error)
+        else:
+            upserted, removed = self.event_index.sync(events)
+            logger.info(f"Synced events: {upserted} updated, {removed} removed.")
+            self.last_success = started
+            self.last_poll = self.make_poll_status(started, ok=True)
+        self.next_event = self.get_next_event()
+        return self.next_event
+
+    def get_next_event(self):
+        """
+        Returns the first event that hasn't been alarmed yet, including events that
+        started less than catch_up_grace ago, e.g. while the notifier was down.
+        """
+        now_dt = datetime.datetime.now(datetime.timezone.utc)
+        since_dt = now_dt - datetime.timedelta(seconds=self.catch_up_grace)
+        return self.event_index.next_after(since_dt, skip=self.journal.has_fired)
+
+    def make_poll_status(self, started, ok, error=None):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        last_success = self.last_success
+        return {
+            "at": started.isoformat() if started else None,
+            "ok": ok,
+            "duration": (now - started).total_seconds() if started else None,
+            "error": error,
+            # alarms come from a schedule fetched before the last poll
+            "stale": ok is False,
+            "last_success": last_success.isoformat() if last_success else None,
+        }
+
+    def get_upcoming_alarms(self):
+        now_dt = datetime.datetime.now(datetime.timezone.utc)
+        alarms = []
+        for event in self.event_index.starting_within(now_dt, UPCOMING_WINDOW):
+            start_dt = datetime.datetime.fromisoformat(event["start"]["dateTime"])
+            notify_dt = start_dt - datetime.timedelta(seconds=self.alarm_offset)
+            alarms.append(
+                {
+                    "id": event["id"],
+                    "summary": event.get("summary", "No Title"),
+                    "start": event["start"]["dateTime"],
+                    "notify_at": notify_dt.isoformat(),
+                    "fired": self.journal.has_fired(event),
+                    "dismissed": self.journal.was_dismissed(event),
+                }
+            )
+        return alarms
+
+    def get_poll_status(self):
+        return {**self.last_poll, "running": self.is_running()}
+
+    def fire_test_alert(self):
+        """Shows the next event (or a placeholder) without touching the journal."""
+        event = self.next_event
+        if event is None:
+            start_dt = datetime.datetime.now(datetime.timezone.utc)
+            start_dt += datetime.timedelta(seconds=self.alarm_offset)
+            event = {
+                "id": "test",
+                "summary": "Test Event",
+                "start": {"dateTime": start_dt.isoformat()},
+            }
+        if not self._test_alert_lock.acquire(blocking=False):
+            raise RuntimeError("A test alert is already showing.")
+        logger.info(f"Firing test alert for {event.get('summary')}.")
+
+        def show():
+            try:
+                self.send_notification_func(event.copy(), self.event_index)
+            finally:
+                self._test_alert_lock.release()
+
+        threading.Thread(target=show, name="test-alert", daemon=True).start()
+        return {"summary": event.get("summary")}
+
+    def get_time_till_start(self, next_event):
         start_time_str = next_event["start"]["dateTime"]
         event_start_dt = datetime.datetime.fromisoformat(start_time_str)
-        notify_dt = event_start_dt - datetime.timedelta(seconds=self.alarm_offset)
         now_dt = datetime.datetime.now(datetime.timezone.utc)
-        time_till_notify = (notify_dt - now_dt).total_seconds()
+        return (event_start_dt - now_dt).total_seconds()
+
+    def get_time_till_notify(self, next_event):
+        time_till_notify = self.get_time_till_start(next_event) - self.alarm_offset
         return time_till_notify
 
+    def get_companion_events(self, event):
+        """Events listed on this alert whose own alarm would fire before it starts."""
+        start_dt = datetime.datetime.fromisoformat(event["start"]["dateTime"])
+        due_before = start_dt + datetime.timedelta(seconds=self.alarm_offset)
+        return [
+            other
+            for other in self.event_index.concurrent_with(event)
+            if datetime.datetime.fromisoformat(other["start"]["dateTime"]) < due_before
+        ]
+
     def send_notification(self, next_event):
+        # claim atomically so a replaced worker can't show it a second time,
+        # a claim that is never marked fired is shown again after a restart
+        if not self.journal.claim(next_event):
+            logger.info("Notification already sent for event, skipping.")
+            return
+        claimed = [next_event]
+        for companion in self.get_companion_events(next_event):
+            if self.journal.claim(companion):
+                logger.info(f"Also notifying for {companion.get('summary')}.")
+                claimed.append(companion)
         logger.info("Sending notification.")
         try:
-            self.send_notification_func(next_event.copy())
+            with self.stage("notify"):
+                dismissed = self.send_notification_func(
+                    next_event.copy(), self.event_index
+                )
+            # companions were on the same alert, so they share its outcome
+            for event in claimed:
+                if dismissed:
+                    self.journal.record_dismissed(event)
+                else:
+                    self.journal.record_fired(event)
         except Exception as e:
             logger.error(f"Failed to send notification: {e}")
             print(f"Failed to send notification: {e}")
 
     def send_heartbeat(self):
         try:
-            requests.get(self.heartbeat_url)
+            requests.get(self.heartbeat_url, timeout=10)
             logger.info(f"Pinged {self.heartbeat_url}")
         except requests.RequestException as e:
             logger.error(f"Failed to ping {self.heartbeat_url}: {e}")
 
+    def send_heartbeat_fail(self, message):
+        fail_url = f"{self.heartbeat_url.rstrip('/')}/fail"
+        try:
+            requests.post(fail_url, data=message.encode(), timeout=10)
+            logger.info(f"Reported failure to {fail_url}")
+        except requests.RequestException as e:
+            logger.error(f"Failed to ping {fail_url}: {e}")
+
 
 def main():
     pass
@@ -1,17 +1,24 @@
+import functools
 import os.path
 from datetime import datetime, timezone
 from pprint import pprint
 
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 
 from event import CalendarEvent
+from request_governor import RequestGovernor
 
 SCOPES = ["https://www.googleapis.com/auth/calendar.events.readonly"]
 CREDENTIALS_PATH = "credentials.json"
 TOKEN_PATH = "token.json"
+REQUEST_TIMEOUT = 20  # seconds per attempt, the governor's deadline bounds retries
+
+governor = RequestGovernor()
 
 
 def get_credentials(credentials_path=CREDENTIALS_PATH, token_path=TOKEN_PATH):
@@ -21,7 +28,10 @@ def get_credentials(credentials_path=CREDENTIALS_PATH, token_path=TOKEN_PATH):
         creds = Credentials.from_authorized_user_file(token_path, SCOPES)
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+            # refreshing is a network call, so it goes through the governor too,
+            # with our timeout instead of google-auth's 120 s default
+            request = functools.partial(Request(), timeout=REQUEST_TIMEOUT)
+            governor.execute(lambda: creds.refresh(request), account="primary")
         else:
             flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
             creds = flow.run_local_server(port=0)
@@ -30,24 +40,33 @@ def get_credentials(credentials_path=CREDENTIALS_PATH, token_path=TOKEN_PATH):
     return creds
 
 
-def get_next_event() -> CalendarEvent:
-    """Fetches the next event from the user's Google Calendar."""
+def build_service(credentials):
+    http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=REQUEST_TIMEOUT))
+    return build("calendar", "v3", http=http)
+
+
+def get_upcoming_events(max_results=50) -> list[CalendarEvent]:
+    """
+    Fetches events that haven't ended yet from the user's Google Calendar.
+    Raises GovernorError if the API is unavailable, callers keep their last schedule.
+    """
     credentials = get_credentials()
-    service = build("calendar", "v3", credentials=credentials)
+    service = build_service(credentials)
     now = datetime.now(timezone.utc).isoformat()
-    events_result = (
-        service.events()
-        .list(
-            calendarId="primary",
-            timeMin=now,
-            maxResults=10,
-            singleEvents=True,
-            orderBy="startTime",
-        )
-        .execute()
+    request = service.events().list(
+        calendarId="primary",
+        timeMin=now,
+        maxResults=max_results,
+        singleEvents=True,
+        orderBy="startTime",
     )
-    events = events_result.get("items", [])
-    events = filter_events(events)
+    events_result = governor.execute(request.execute, account="primary")
+    return events_result.get("items", [])
+
+
+def get_next_event() -> CalendarEvent | None:
+    """Fetches the next event from the user's Google Calendar."""
+    events = filter_events(get_upcoming_events(max_results=10))
     next_event = events[0] if events else None
     return next_event
 
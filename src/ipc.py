@@ -0,0 +1,138 @@
+import argparse
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import threading
+from typing import Any, Callable
+
+from logger import logger
+
+"""
+Local query interface for the running notifier:
+1. The notifier serves a few commands on a loopback TCP port
+2. Each request is one line with the secret token and command, each reply is JSON
+3. Replies come from the notifier's memory, never from the Calendar API
+The token is written to a file only the current user can read, so other local
+users can't read meeting titles or pop up alerts.
+Usage: python ipc.py upcoming|status|test
+"""
+
+IPC_HOST = "127.0.0.1"
+IPC_PORT = 47621
+IPC_TOKEN_PATH = os.path.join(os.path.expanduser("~"), ".unmissable_ipc_token")
+MAX_REQUEST_LENGTH = 1024  # bytes, a token and command fit easily
+
+
+def write_token(token_path: str) -> str:
+    token = secrets.token_hex(32)
+    # created readable by the owner only, the home directory protects it on Windows
+    fd = os.open(token_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    os.chmod(token_path, 0o600)
+    return token
+
+
+def read_token(token_path: str) -> str:
+    with open(token_path) as f:
+        return f.read().strip()
+
+
+class IpcServer(threading.Thread):
+    def __init__(
+        self,
+        handlers: dict[str, Callable[[], Any]],
+        host: str = IPC_HOST,
+        port: int = IPC_PORT,
+        token_path: str = IPC_TOKEN_PATH,
+        timeout: float = 5,
+    ):
+        super().__init__(name="ipc", daemon=True)
+        self.handlers = handlers
+        self.timeout = timeout  # in seconds, idle clients are dropped after it
+        self.server = socketserver.ThreadingTCPServer(
+            (host, port), self._make_request_handler()
+        )
+        self.server.daemon_threads = True
+        # only after binding, so a second instance can't replace the running one's token
+        self.token = write_token(token_path)
+
+    def _make_request_handler(self):
+        handlers = self.handlers
+        ipc_server = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            timeout = ipc_server.timeout
+
+            def handle(self):
+                try:
+                    raw = self.rfile.readline(MAX_REQUEST_LENGTH)
+                except OSError as e:
+                    logger.warning(f"Dropped IPC client {self.client_address}: {e}")
+                    return
+                line = raw.decode(errors="replace").strip()
+                given_token, _, command = line.partition(" ")
+                handler = handlers.get(command)
+                token = ipc_server.token
+                if not hmac.compare_digest(given_token.encode(), token.encode()):
+                    reply = {"ok": False, "error": "Unauthorized"}
+                elif handler is None:
+                    reply = {"ok": False, "error": f"Unknown command: {command!r}"}
+                else:
+                    try:
+                        reply = {"ok": True, "result": handler()}
+                    except Exception as e:
+                        logger.error(f"IPC command {command!r} failed: {e}")
+                        reply = {"ok": False, "error": str(e)}
+                self.wfile.write((json.dumps(reply, default=str) + "\n").encode())
+
+        return RequestHandler
+
+    def run(self):
+        logger.info(f"Serving IPC on {self.server.server_address}")
+        self.server.serve_forever()
+
+    def stop(self):
+        # shutdown waits for serve_forever, which never runs if the thread didn't start
+        if self.is_alive():
+            self.server.shutdown()
+        self.server.server_close()
+
+
+def query(
+    command: str,
+    host: str = IPC_HOST,
+    port: int = IPC_PORT,
+    token_path: str = IPC_TOKEN_PATH,
+    timeout=5,
+):
+    """Sends a command to the running notifier and returns its decoded reply."""
+    token = read_token(token_path)
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(f"{token} {command}\n".encode())
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the running notifier.")
+    parser.add_argument("command", choices=["upcoming", "status", "test"])
+    parser.add_argument("--port", type=int, default=IPC_PORT)
+    args = parser.parse_args()
+
+    try:
+        reply = query(args.command, port=args.port)
+    except OSError as e:
+        print(f"Could not reach notifier on port {args.port}: {e}")
+        return
+    if reply["ok"]:
+        print(json.dumps(reply["result"], indent=2))
+    else:
+        print(f"Error: {reply['error']}")
+
+
+if __name__ == "__main__":
+    main()
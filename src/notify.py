@@ -9,6 +9,7 @@ from screeninfo import get_monitors
 from colors import colors
 from logger import logger
 from event import CalendarEvent
+from event_index import EventIndex
 
 # seconds (longer is better, good that it is dismissed by you)
 DEFAULT_HOLD_DURATION = 200
@@ -18,11 +19,16 @@ TEXT_COLOR_PRIMARY = colors["Orange"][400]
 TEXT_COLOR_SECONDARY = colors["Gray"][200]
 
 
-def display_event_on_all_screens(event: CalendarEvent):
-    """Displays event on all screens"""
+def display_event_on_all_screens(
+    event: CalendarEvent, event_index: EventIndex | None = None
+) -> bool:
+    """Displays event on all screens, returns True if the user dismissed it"""
     monitors = get_monitors()
     logger.info(f"Detected monitors: {monitors}")
     dismiss_event = threading.Event()  # Shared event to signal dismissal
+    concurrent_events = []
+    if event_index is not None:
+        concurrent_events = event_index.concurrent_with(event)
 
     def create_window(monitor):
         try:
@@ -80,6 +86,20 @@ def display_event_on_all_screens(event: CalendarEvent):
             )
             time_label.pack(pady=(20, 100))
 
+            if concurrent_events:
+                summaries = ", ".join(
+                    e.get("summary", "No Title") for e in concurrent_events
+                )
+                concurrent_label = tk.Label(
+                    frame,
+                    text=f"Also at this time: {summaries}",
+                    font=("Arial", int(font_size2 * 2 / 3)),
+                    fg=TEXT_COLOR_SECONDARY,
+                    bg=BG_COLOR,
+                    wraplength=int(monitor.width * 0.8),
+                )
+                concurrent_label.pack(pady=(0, 60))
+
             def on_dismiss():
                 logger.info(f"Dismiss button clicked for monitor {monitor}")
                 dismiss_event.set()  # Signal all windows to close
@@ -192,6 +212,7 @@ def display_event_on_all_screens(event: CalendarEvent):
     for t in threads:
         t.join()
     logger.info("All threads have finished.")
+    return dismiss_event.is_set()
 
 
 def main():
@@ -0,0 +1,198 @@
+import random
+import threading
+import time
+from typing import Callable, TypeVar
+
+import httplib2
+from google.auth.exceptions import TransportError
+from googleapiclient.errors import HttpError
+
+from logger import logger
+
+"""
+Request governor for Google Calendar API calls:
+1. Refuse the call outright if the account's circuit breaker is open
+2. Wait for a token from the account's bucket so polls can't pile up
+3. Retry transient errors with jittered backoff until the deadline runs out
+4. A call that runs out of retries counts as one failure towards the breaker
+"""
+
+T = TypeVar("T")
+
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = (b"rateLimitExceeded", b"userRateLimitExceeded")
+
+
+class GovernorError(Exception):
+    """Raised when a call could not be completed within the governor's limits."""
+
+
+class CircuitOpenError(GovernorError):
+    """Raised when calls are refused because of recent repeated failures."""
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        if status in TRANSIENT_STATUSES:
+            return True
+        # quota errors come back as 403 with a rate limit reason
+        content = error.content or b""
+        return status == 403 and any(r in content for r in RATE_LIMIT_REASONS)
+    # timeouts, resets, DNS and SSL failures are all OSErrors,
+    # token refreshes wrap them in TransportError
+    return isinstance(error, (OSError, httplib2.HttpLib2Error, TransportError))
+
+
+def retry_after(error: Exception) -> float | None:
+    if not isinstance(error, HttpError):
+        return None
+    try:
+        return float(error.resp.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: float) -> bool:
+        """Takes a token, waiting for one until the deadline. Returns False on timeout."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self.updated
+                self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout  # in seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Closed lets calls through, open refuses them until reset_timeout lets one probe through."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # half-open: let a probe through, a failure re-opens immediately
+                self.opened_at = None
+                self.failures = self.failure_threshold - 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                logger.warning(
+                    f"Circuit opened after {self.failures} failures, "
+                    f"pausing calls for {self.reset_timeout} s."
+                )
+
+
+class RequestGovernor:
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: int = 5,
+        deadline: float = 60,
+        max_attempts: int = 5,
+        base_backoff: float = 1,
+        max_backoff: float = 16,
+        failure_threshold: int = 3,
+        reset_timeout: float = 5 * 60,
+    ):
+        self.rate = rate  # calls per second per account
+        self.burst = burst
+        self.deadline = deadline  # in seconds, for all attempts of one call
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff  # in seconds
+        self.max_backoff = max_backoff  # in seconds
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout  # in seconds
+        self._buckets: dict[str, TokenBucket] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _get_bucket(self, account: str) -> TokenBucket:
+        with self._lock:
+            if account not in self._buckets:
+                self._buckets[account] = TokenBucket(self.rate, self.burst)
+            return self._buckets[account]
+
+    def _get_breaker(self, account: str) -> CircuitBreaker:
+        with self._lock:
+            if account not in self._breakers:
+                self._breakers[account] = CircuitBreaker(
+                    self.failure_threshold, self.reset_timeout
+                )
+            return self._breakers[account]
+
+    def execute(self, call: Callable[[], T], account: str = "primary") -> T:
+        """
+        Runs call under the account's rate limit and circuit breaker.
+        Socket timeouts bound each attempt, the deadline bounds all of them together.
+        """
+        deadline = time.monotonic() + self.deadline
+        bucket = self._get_bucket(account)
+        breaker = self._get_breaker(account)
+
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {account}, skipping call.")
+
+        for attempt in range(self.max_attempts):
+            if not bucket.acquire(deadline):
+                raise GovernorError(f"Rate limit for {account} not cleared in time.")
+
+            try:
+                result = call()
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                backoff = min(self.max_backoff, self.base_backoff * 2**attempt)
+                wait = retry_after(e) or random.uniform(0, backoff)
+                logger.warning(
+                    f"Transient error calling Calendar API for {account} "
+                    f"(attempt {attempt + 1}/{self.max_attempts}): {e}"
+                )
+                if attempt + 1 == self.max_attempts:
+                    breaker.record_failure()
+                    raise GovernorError(
+                        f"Calendar API call for {account} failed after "
+                        f"{self.max_attempts} attempts: {e}"
+                    ) from e
+                if time.monotonic() + wait > deadline:
+                    breaker.record_failure()
+                    raise GovernorError(
+                        f"Deadline exceeded calling Calendar API for {account}: {e}"
+                    ) from e
+                time.sleep(wait)
+            else:
+                breaker.record_success()
+                return result
+
+        raise GovernorError(f"Calendar API call for {account} was not attempted.")
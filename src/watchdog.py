@@ -0,0 +1,79 @@
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Callable
+
+from logger import logger
+
+"""
+Watchdog for the notifier loop:
+1. The worker marks each stage of the loop with a time budget
+2. A background thread checks every few seconds if the current stage is over budget
+3. If it is, dump every thread's stack to the log and report the stall once
+"""
+
+
+def format_thread_stacks() -> str:
+    names = {t.ident: t.name for t in threading.enumerate()}
+    lines = []
+    for ident, frame in sys._current_frames().items():
+        lines.append(f"Thread {names.get(ident, ident)} ({ident}):\n")
+        lines.extend(traceback.format_stack(frame))
+    return "".join(lines)
+
+
+class Watchdog(threading.Thread):
+    def __init__(
+        self,
+        on_stall: Callable[[str, float], None],
+        check_interval: float = 5,
+    ):
+        super().__init__(name="watchdog", daemon=True)
+        self.on_stall = on_stall  # called with stage name and seconds spent in it
+        self.check_interval = check_interval  # in seconds
+        self.worker_ident: int | None = None
+        # (stage, started, budget), replaced as a whole so reads need no lock
+        self._current: tuple[str, float, float] | None = None
+        self._reported: tuple[str, float, float] | None = None
+        self._stop_event = threading.Event()
+
+    def watch(self, worker: threading.Thread):
+        """Only stages entered from this worker are tracked from now on."""
+        self.worker_ident = worker.ident
+        self._current = None
+
+    @contextmanager
+    def stage(self, name: str, budget: float):
+        if threading.get_ident() != self.worker_ident:
+            yield
+            return
+        self._current = (name, time.monotonic(), budget)
+        try:
+            yield
+        finally:
+            if threading.get_ident() == self.worker_ident:
+                self._current = None
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self.check_interval):
+            current = self._current
+            if current is None or current is self._reported:
+                continue
+            name, started, budget = current
+            elapsed = time.monotonic() - started
+            if elapsed <= budget:
+                continue
+            self._reported = current
+            logger.error(
+                f"Stage '{name}' stalled: {elapsed:.0f} s spent, budget {budget:.0f} s. "
+                f"Thread stacks:\n{format_thread_stacks()}"
+            )
+            try:
+                self.on_stall(name, elapsed)
+            except Exception as e:
+                logger.error(f"Failed to handle stall of stage '{name}': {e}")
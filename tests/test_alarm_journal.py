@@ -0,0 +1,92 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from alarm_journal import AlarmJournal
+
+
+def make_event(event_id, start):
+    return {"id": event_id, "start": {"dateTime": start.isoformat()}}
+
+
+def soon(**kwargs):
+    return datetime.now(timezone.utc) + timedelta(**kwargs)
+
+
+def test_replays_fired_and_dismissed(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    fired = make_event("a", soon(hours=1))
+    dismissed = make_event("b", soon(hours=2))
+    journal = AlarmJournal(path)
+    journal.record_fired(fired)
+    journal.record_fired(dismissed)
+    journal.record_dismissed(dismissed)
+
+    replayed = AlarmJournal(path)
+    assert replayed.has_fired(fired)
+    assert not replayed.was_dismissed(fired)
+    assert replayed.was_dismissed(dismissed)
+    assert not replayed.has_fired(make_event("c", soon(hours=1)))
+
+
+def test_rescheduled_event_alarms_again(tmp_path):
+    journal = AlarmJournal(str(tmp_path / "journal.jsonl"))
+    journal.record_fired(make_event("a", soon(hours=1)))
+    assert not journal.has_fired(make_event("a", soon(hours=2)))
+
+
+def test_same_instant_with_other_offset_is_same_alarm(tmp_path):
+    journal = AlarmJournal(str(tmp_path / "journal.jsonl"))
+    start = soon(hours=1).replace(microsecond=0)
+    journal.record_fired(make_event("a", start))
+    other_offset = start.astimezone(timezone(timedelta(hours=-5)))
+    assert journal.has_fired(make_event("a", other_offset))
+
+
+def test_skips_torn_last_line(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    event = make_event("a", soon(hours=1))
+    AlarmJournal(str(path)).record_fired(event)
+    with open(path, "a") as f:
+        f.write('{"id": "b", "sta')
+
+    replayed = AlarmJournal(str(path))
+    assert replayed.has_fired(event)
+    # compaction on load drops the torn line from the file
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["a"]
+
+
+def test_compaction_drops_expired_and_duplicate_lines(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    old = make_event("old", soon(days=-2))
+    live = make_event("live", soon(hours=1))
+    journal = AlarmJournal(str(path), compact_every=1000)
+    journal.record_fired(old)
+    journal.record_fired(live)
+    journal.record_dismissed(live)
+    assert len(path.read_text().splitlines()) == 3
+
+    journal.compact()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(e["id"], e["state"]) for e in lines] == [("live", "dismissed")]
+    assert not journal.has_fired(old)
+
+
+def test_claim_only_succeeds_once(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    event = make_event("a", soon(hours=1))
+    journal = AlarmJournal(path)
+    assert journal.claim(event)
+    assert not journal.claim(event)
+    journal.record_fired(event)
+    assert not AlarmJournal(path).claim(event)
+
+
+def test_claim_never_fired_is_forgotten_on_restart(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    event = make_event("a", soon(hours=1))
+    AlarmJournal(path).claim(event)
+
+    replayed = AlarmJournal(path)
+    assert not replayed.has_fired(event)
+    assert replayed.claim(event)
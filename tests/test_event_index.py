@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+
+from event_index import EventIndex
+
+T0 = datetime(2026, 1, 5, 9, 0, tzinfo=timezone.utc)
+
+
+def make_event(event_id, start_minutes, duration_minutes=30, etag="1"):
+    start = T0 + timedelta(minutes=start_minutes)
+    end = start + timedelta(minutes=duration_minutes)
+    return {
+        "id": event_id,
+        "etag": etag,
+        "summary": event_id,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": end.isoformat()},
+    }
+
+
+def at(minutes):
+    return T0 + timedelta(minutes=minutes)
+
+
+def ids(events):
+    return [event["id"] for event in events]
+
+
+def make_index(*events):
+    index = EventIndex()
+    for event in events:
+        index.upsert(event)
+    return index
+
+
+def test_next_after_and_skip():
+    index = make_index(make_event("b", 60), make_event("a", 0), make_event("c", 120))
+    assert index.next_after(at(-10))["id"] == "a"
+    assert index.next_after(at(0))["id"] == "a"
+    assert index.next_after(at(1))["id"] == "b"
+    assert index.next_after(at(0), skip=lambda e: e["id"] == "a")["id"] == "b"
+    assert index.next_after(at(121)) is None
+
+
+def test_all_day_events_are_not_indexed():
+    all_day = {
+        "id": "d",
+        "start": {"date": "2026-01-05"},
+        "end": {"date": "2026-01-06"},
+    }
+    index = make_index(all_day)
+    assert len(index) == 0
+
+
+def test_overlapping():
+    index = make_index(
+        make_event("before", -60, 30),
+        make_event("running", -10, 30),
+        make_event("inside", 5, 10),
+        make_event("touching", 30, 30),
+    )
+    assert ids(index.overlapping(at(0), at(30))) == ["running", "inside"]
+
+
+def test_starting_within():
+    index = make_index(make_event("a", 0), make_event("b", 3), make_event("c", 4))
+    assert ids(index.starting_within(at(0), 3 * 60 + 5)) == ["a", "b"]
+
+
+def test_upsert_moves_rescheduled_event():
+    index = make_index(make_event("a", 0))
+    index.upsert(make_event("a", 90))
+    assert len(index) == 1
+    assert index.next_after(at(-1))["id"] == "a"
+    assert index.overlapping(at(0), at(10)) == []
+
+
+def test_remove_shrinks_overlap_scan():
+    conference = make_event("conference", 0, 3 * 24 * 60)
+    index = make_index(conference, make_event("a", 10))
+    assert "conference" in ids(index.overlapping(at(2000), at(2010)))
+
+    index.remove("conference")
+    assert index._max_duration == 30 * 60
+    assert index.overlapping(at(2000), at(2010)) == []
+
+
+def test_sync_applies_only_deltas():
+    index = EventIndex()
+    assert index.sync([make_event("a", 0), make_event("b", 60)]) == (2, 0)
+    assert index.sync([make_event("a", 0), make_event("b", 60)]) == (0, 0)
+    assert index.sync([make_event("a", 30, etag="2"), make_event("c", 90)]) == (2, 1)
+    assert ids(index.overlapping(at(0), at(200))) == ["a", "c"]
+
+
+def test_apply_changes_deletes_cancelled():
+    index = make_index(make_event("a", 0), make_event("b", 60))
+    index.apply_changes([{"id": "a", "status": "cancelled"}, make_event("c", 90)])
+    assert ids(index.overlapping(at(0), at(200))) == ["b", "c"]
+
+
+def test_concurrent_with_excludes_event_itself():
+    index = make_index(make_event("a", 0), make_event("b", 0), make_event("later", 60))
+    assert ids(index.concurrent_with(index.get("a"))) == ["b"]
@@ -0,0 +1,303 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import event_notifier
+from alarm_journal import AlarmJournal
+from event_notifier import EventNotifier
+from request_governor import GovernorError
+from watchdog import Watchdog
+
+
+@pytest.fixture(autouse=True)
+def heartbeat_fails(monkeypatch):
+    fails = []
+    monkeypatch.setattr(event_notifier.requests, "get", lambda *a, **k: None)
+    monkeypatch.setattr(
+        event_notifier.requests, "post", lambda url, data, **k: fails.append(data)
+    )
+    return fails
+
+
+def make_event(event_id, start_seconds, duration_minutes=30):
+    start = datetime.now(timezone.utc) + timedelta(seconds=start_seconds)
+    end = start + timedelta(minutes=duration_minutes)
+    return {
+        "id": event_id,
+        "etag": "1",
+        "summary": event_id,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": end.isoformat()},
+    }
+
+
+class Alerts:
+    """Stands in for the full-screen alert, records what was shown and by whom."""
+
+    def __init__(self, dismiss=False):
+        self.dismiss = dismiss
+        self.shown = []
+        self.threads = []
+
+    def __call__(self, event, event_index):
+        self.shown.append(event["id"])
+        self.threads.append(threading.current_thread())
+        return self.dismiss
+
+
+def make_notifier(tmp_path, events, alerts, **kwargs):
+    kwargs.setdefault("poll_interval", 0.01)
+    notifier = EventNotifier(
+        get_events_func=lambda: events,
+        send_notification_func=alerts,
+        heartbeat_url="http://heartbeat",
+        journal=AlarmJournal(str(tmp_path / "journal.jsonl")),
+        ipc_port=None,
+        **kwargs,
+    )
+    # run the loop body on this thread instead of a worker
+    notifier.worker = threading.current_thread()
+    return notifier
+
+
+def test_alarm_missed_while_down_fires_immediately(tmp_path):
+    alerts = Alerts()
+    # alarm time was 2 minutes ago, the event starts in a minute
+    notifier = make_notifier(tmp_path, [make_event("a", 60)], alerts)
+    notifier.check_and_wait()
+    assert alerts.shown == ["a"]
+
+
+def test_event_started_within_grace_fires_once(tmp_path):
+    alerts = Alerts()
+    notifier = make_notifier(tmp_path, [make_event("a", -60)], alerts)
+    notifier.check_and_wait()
+    notifier.check_and_wait()
+    assert alerts.shown == ["a"]
+
+
+def test_event_started_before_grace_is_skipped(tmp_path):
+    alerts = Alerts()
+    notifier = make_notifier(
+        tmp_path, [make_event("a", -10 * 60)], alerts, catch_up_grace=5 * 60
+    )
+    notifier.check_and_wait()
+    assert alerts.shown == []
+
+
+def test_fired_alarm_is_not_shown_again_after_restart(tmp_path):
+    events = [make_event("a", 60)]
+    alerts = Alerts()
+    make_notifier(tmp_path, events, alerts).check_and_wait()
+    make_notifier(tmp_path, events, alerts).check_and_wait()
+    assert alerts.shown == ["a"]
+
+
+def test_alarm_interrupted_by_crash_is_shown_again_after_restart(tmp_path):
+    events = [make_event("a", -60)]
+    AlarmJournal(str(tmp_path / "journal.jsonl")).claim(events[0])
+
+    alerts = Alerts()
+    make_notifier(tmp_path, events, alerts).check_and_wait()
+    assert alerts.shown == ["a"]
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_watchdog_reports_each_stall_once():
+    stalls = []
+    watchdog = Watchdog(
+        on_stall=lambda *args: stalls.append(args), check_interval=0.01
+    )
+    watchdog.watch(threading.current_thread())
+    watchdog.start()
+    try:
+        with watchdog.stage("fetch", budget=0.02):
+            time.sleep(0.2)
+        with watchdog.stage("fetch", budget=0.02):
+            time.sleep(0.2)
+        with watchdog.stage("wait", budget=10):
+            time.sleep(0.05)
+    finally:
+        watchdog.stop()
+    assert [stage for stage, _ in stalls] == ["fetch", "fetch"]
+
+
+def test_watchdog_ignores_stages_of_other_threads():
+    stalls = []
+    watchdog = Watchdog(
+        on_stall=lambda *args: stalls.append(args), check_interval=0.01
+    )
+    watchdog.watch(threading.current_thread())
+    watchdog.start()
+
+    def other():
+        with watchdog.stage("fetch", budget=0.01):
+            time.sleep(0.2)
+
+    try:
+        thread = threading.Thread(target=other)
+        thread.start()
+        thread.join()
+    finally:
+        watchdog.stop()
+    assert stalls == []
+
+
+class HangingFetch:
+    """The first fetch blocks until released, then returns result or raises it."""
+
+    def __init__(self, result):
+        self.result = result
+        self.release = threading.Event()
+        self.threads = []
+
+    def __call__(self):
+        self.threads.append(threading.current_thread())
+        if len(self.threads) == 1:
+            self.release.wait(5)
+            if isinstance(self.result, Exception):
+                raise self.result
+            return self.result
+        return []
+
+
+def start_restarting_notifier(tmp_path, alerts, fetch):
+    notifier = make_notifier(
+        tmp_path,
+        [],
+        alerts,
+        poll_interval=60,
+        stage_budgets={"fetch": 0.1},
+        restart_on_stall=True,
+    )
+    notifier.get_events_func = fetch
+    notifier.watchdog.check_interval = 0.02
+    notifier.start()
+    return notifier
+
+
+@pytest.mark.parametrize(
+    "result", [[make_event("a", 60)], ValueError("late failure")], ids=["due", "raises"]
+)
+def test_stalled_worker_is_replaced_and_exits_quietly(
+    tmp_path, heartbeat_fails, result
+):
+    alerts = Alerts()
+    fetch = HangingFetch(result)
+    notifier = start_restarting_notifier(tmp_path, alerts, fetch)
+    try:
+        wait_until(lambda: notifier.last_poll["ok"] is True)
+        old_worker, new_worker = fetch.threads
+        assert notifier.worker is new_worker
+
+        fetch.release.set()
+        old_worker.join(5)
+        assert not old_worker.is_alive()
+        assert notifier.is_running()
+        assert alerts.shown == []
+        assert len(heartbeat_fails) == 1
+        assert heartbeat_fails[0].startswith(b"Stage 'fetch' stalled")
+        assert notifier.last_poll["ok"] is True
+    finally:
+        fetch.release.set()
+        notifier.stop()
+
+
+def test_worker_is_not_replaced_while_replaced_worker_is_stuck(
+    tmp_path, heartbeat_fails
+):
+    alerts = Alerts()
+    release = threading.Event()
+    threads = []
+
+    def fetch():
+        threads.append(threading.current_thread())
+        release.wait(5)
+        return []
+
+    notifier = start_restarting_notifier(tmp_path, alerts, fetch)
+    try:
+        wait_until(lambda: len(heartbeat_fails) == 2)
+        time.sleep(0.3)
+        assert len(threads) == 2
+    finally:
+        release.set()
+        notifier.stop()
+
+
+def test_upcoming_alarms_report_fired_and_dismissed(tmp_path):
+    events = [make_event("a", 60), make_event("b", 2 * 60), make_event("c", 3 * 60)]
+    notifier = make_notifier(tmp_path, events, Alerts())
+    notifier.poll()
+    notifier.journal.record_fired(events[0])
+    notifier.journal.record_dismissed(events[1])
+
+    alarms = notifier.get_upcoming_alarms()
+    assert [(a["id"], a["fired"], a["dismissed"]) for a in alarms] == [
+        ("a", True, False),
+        ("b", True, True),
+        ("c", False, False),
+    ]
+    start = datetime.fromisoformat(alarms[0]["start"])
+    notify_at = datetime.fromisoformat(alarms[0]["notify_at"])
+    assert start - notify_at == timedelta(seconds=notifier.alarm_offset)
+
+
+def test_poll_status_goes_stale_when_calendar_unavailable(tmp_path):
+    events = [make_event("a", 60 * 60)]
+    notifier = make_notifier(tmp_path, events, Alerts())
+    notifier.poll()
+    status = notifier.get_poll_status()
+    assert status["ok"] is True and status["stale"] is False
+
+    def unavailable():
+        raise GovernorError("Circuit open")
+
+    notifier.get_events_func = unavailable
+    assert notifier.poll()["id"] == "a"  # still alarming from the last schedule
+    status = notifier.get_poll_status()
+    assert status["ok"] is False
+    assert status["stale"] is True
+    assert status["error"] == "Circuit open"
+    assert status["last_success"] == notifier.last_success.isoformat()
+    assert status["running"] is True
+
+
+def test_only_one_test_alert_at_a_time(tmp_path):
+    release = threading.Event()
+    shown = []
+
+    def alert(event, event_index):
+        shown.append(event["id"])
+        release.wait(5)
+
+    notifier = make_notifier(tmp_path, [], alert)
+    assert notifier.fire_test_alert() == {"summary": "Test Event"}
+    with pytest.raises(RuntimeError):
+        notifier.fire_test_alert()
+
+    release.set()
+    wait_until(lambda: not notifier._test_alert_lock.locked())
+    notifier.fire_test_alert()
+    wait_until(lambda: len(shown) == 2)
+    assert shown == ["test", "test"]
+
+
+def test_dismissing_an_alert_dismisses_its_companions(tmp_path):
+    events = [make_event("a", 60), make_event("b", 60)]
+    alerts = Alerts(dismiss=True)
+    notifier = make_notifier(tmp_path, events, alerts)
+    notifier.check_and_wait()
+    notifier.check_and_wait()
+
+    assert len(alerts.shown) == 1
+    replayed = AlarmJournal(str(tmp_path / "journal.jsonl"))
+    assert all(replayed.was_dismissed(event) for event in events)
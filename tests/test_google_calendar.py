@@ -0,0 +1,33 @@
+import google_calendar
+
+
+class FakeRequest:
+    calls = []
+
+    def __call__(self, url, method="GET", timeout=120, **kwargs):
+        self.calls.append(timeout)
+
+
+class ExpiredCredentials:
+    valid = False
+    expired = True
+    refresh_token = "refresh"
+
+    def refresh(self, request):
+        request(url="https://oauth2.googleapis.com/token", method="POST")
+
+    def to_json(self):
+        return "{}"
+
+
+def test_token_refresh_uses_request_timeout(tmp_path, monkeypatch):
+    token_path = tmp_path / "token.json"
+    token_path.write_text("{}")
+    monkeypatch.setattr(google_calendar, "Request", FakeRequest)
+    monkeypatch.setattr(
+        google_calendar.Credentials,
+        "from_authorized_user_file",
+        lambda path, scopes: ExpiredCredentials(),
+    )
+    google_calendar.get_credentials(token_path=str(token_path))
+    assert FakeRequest.calls == [google_calendar.REQUEST_TIMEOUT]
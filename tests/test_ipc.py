@@ -0,0 +1,63 @@
+import socket
+import threading
+
+import pytest
+
+from ipc import MAX_REQUEST_LENGTH, IpcServer, query, read_token
+
+
+@pytest.fixture
+def server(tmp_path):
+    handlers = {"status": lambda: {"ok": True}}
+    server = IpcServer(handlers, port=0, token_path=str(tmp_path / "token"))
+    server.start()
+    yield server, server.server.server_address[1], str(tmp_path / "token")
+    server.stop()
+
+
+def test_query_with_token(server):
+    _, port, token_path = server
+    assert query("status", port=port, token_path=token_path) == {
+        "ok": True,
+        "result": {"ok": True},
+    }
+    assert query("bogus", port=port, token_path=token_path)["ok"] is False
+
+
+def test_rejects_wrong_or_missing_token(server):
+    _, port, token_path = server
+    for line in [b"status\n", b"not-the-token status\n"]:
+        with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+            sock.sendall(line)
+            reply = sock.makefile("rb").readline()
+        assert b"Unauthorized" in reply
+    assert read_token(token_path)
+
+
+def test_token_changes_per_server(tmp_path):
+    token_path = str(tmp_path / "token")
+    tokens = []
+    for _ in range(2):
+        server = IpcServer({}, port=0, token_path=token_path)
+        tokens.append(read_token(token_path))
+        server.stop()
+    assert tokens[0] != tokens[1]
+
+
+def test_drops_idle_and_oversized_requests(tmp_path):
+    token_path = str(tmp_path / "token")
+    server = IpcServer({}, port=0, token_path=token_path, timeout=0.1)
+    server.start()
+    port = server.server.server_address[1]
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+            # the server hangs up without a reply instead of waiting forever
+            assert sock.makefile("rb").readline() == b""
+
+        with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+            # no newline, the server stops reading at the limit instead of waiting
+            sock.sendall(b"x" * MAX_REQUEST_LENGTH)
+            reply = sock.makefile("rb").readline()
+        assert b"Unauthorized" in reply
+    finally:
+        server.stop()
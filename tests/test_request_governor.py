@@ -0,0 +1,112 @@
+import time
+
+import httplib2
+import pytest
+from google.auth.exceptions import TransportError
+from googleapiclient.errors import HttpError
+
+from request_governor import (
+    CircuitOpenError,
+    GovernorError,
+    RequestGovernor,
+    TokenBucket,
+)
+
+
+def http_error(status, content=b""):
+    return HttpError(httplib2.Response({"status": status}), content)
+
+
+def make_call(*outcomes):
+    """Returns a call that raises or returns each outcome in turn, and its call log."""
+    calls = []
+
+    def call():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return call, calls
+
+
+def test_retries_transient_errors_until_success():
+    governor = RequestGovernor(burst=10, base_backoff=0)
+    call, calls = make_call(http_error(503), TimeoutError(), TransportError(), "ok")
+    assert governor.execute(call) == "ok"
+    assert len(calls) == 4
+
+
+def test_rate_limit_403_is_retried():
+    governor = RequestGovernor(burst=10, base_backoff=0)
+    call, calls = make_call(http_error(403, b'{"reason": "rateLimitExceeded"}'), "ok")
+    assert governor.execute(call) == "ok"
+
+
+def test_non_transient_error_is_raised_without_retry():
+    governor = RequestGovernor(burst=10, base_backoff=0)
+    call, calls = make_call(http_error(404))
+    with pytest.raises(HttpError):
+        governor.execute(call)
+    assert len(calls) == 1
+
+
+def test_uses_all_attempts_before_giving_up():
+    governor = RequestGovernor(
+        burst=10, base_backoff=0, max_attempts=5, failure_threshold=3
+    )
+    call, calls = make_call(*[http_error(503)] * 5)
+    with pytest.raises(GovernorError) as info:
+        governor.execute(call)
+    assert not isinstance(info.value, CircuitOpenError)
+    assert len(calls) == 5
+
+
+def test_breaker_opens_after_failed_calls_and_resets():
+    governor = RequestGovernor(
+        burst=100,
+        base_backoff=0,
+        max_attempts=2,
+        failure_threshold=2,
+        reset_timeout=0.05,
+    )
+    for _ in range(2):
+        call, _ = make_call(http_error(503), http_error(503))
+        with pytest.raises(GovernorError):
+            governor.execute(call)
+
+    call, calls = make_call("ok")
+    with pytest.raises(CircuitOpenError):
+        governor.execute(call)
+    assert calls == []
+
+    time.sleep(0.06)
+    assert governor.execute(call) == "ok"
+
+
+def test_breaker_is_per_account():
+    governor = RequestGovernor(
+        burst=100, base_backoff=0, max_attempts=1, failure_threshold=1
+    )
+    call, _ = make_call(http_error(500))
+    with pytest.raises(GovernorError):
+        governor.execute(call, account="a")
+    with pytest.raises(CircuitOpenError):
+        governor.execute(call, account="a")
+    assert governor.execute(lambda: "ok", account="b") == "ok"
+
+
+def test_token_bucket_allows_burst_then_times_out():
+    bucket = TokenBucket(rate=0.001, capacity=2)
+    deadline = time.monotonic() + 0.01
+    assert bucket.acquire(deadline)
+    assert bucket.acquire(deadline)
+    assert not bucket.acquire(deadline)
+
+
+def test_token_bucket_refills():
+    bucket = TokenBucket(rate=1000, capacity=1)
+    deadline = time.monotonic() + 1
+    assert bucket.acquire(deadline)
+    assert bucket.acquire(deadline)